@@ -0,0 +1,428 @@
+"""Concurrent-session load test for chatbot.py.
+
+Drives the planner headlessly with Streamlit's AppTest. Each simulated user
+gets its own AppTest session and runs realistic scripts (add a task, mark a
+task done, spin and save a meal, browse calendar months) against a shared,
+seeded SQLite database. For every concurrency level the tool reports rerun
+latency percentiles and lock contention: how often a statement found the
+database busy, how long sessions spent waiting for the lock, and how many
+reruns failed outright with "database is locked". Each level starts from a
+freshly seeded database so levels are comparable.
+
+Sessions run in a process pool: AppTest swaps the global __main__ module on
+every rerun, so several sessions in one process would trample each other.
+
+To measure lock waits, the lock probe opens the app's connections with
+timeout=0 and polls every millisecond while the database is locked, instead
+of using SQLite's own busy handler with its backoff. That changes the retry
+policy under contention, so latencies measured with the probe on can differ
+from production. Pass --no-lock-probe to keep the app's sqlite3.connect
+defaults; busy and wait are then not measured.
+
+Usage:
+    python streamlit_chatbot/load_test.py --sessions 1,2,4,8 --iterations 10
+"""
+
+import argparse
+import functools
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chatbot.py")
+DB_NAME = "tasks.db"  # chatbot.py opens this relative to the working directory
+
+# Weighted mix of user scripts; calendar browsing is the heaviest page.
+SCENARIO_WEIGHTS = {
+    "add_task": 4,
+    "mark_done": 3,
+    "spin_and_save": 3,
+    "browse_calendar": 2,
+}
+
+# Matches sqlite3's default busy timeout, which chatbot.py relies on.
+DEFAULT_BUSY_TIMEOUT = 5.0
+BUSY_POLL = 0.001
+
+# How long the lock probe waits before giving up; set per worker.
+busy_timeout = DEFAULT_BUSY_TIMEOUT
+
+# Lock contention seen by this worker process since the last reset.
+lock_stats = {"busy": 0, "wait": 0.0}
+
+
+# ---------- Lock Probe ----------
+def wait_for_lock(call, *args, **kwargs):
+    """Run a sqlite3 call, polling while the DB is locked and timing the wait.
+
+    Stands in for SQLite's own busy handler so the time spent blocked on
+    another session's lock can be measured. Gives up after busy_timeout like
+    the default handler would, re-raising "database is locked".
+    """
+    waited_since = None
+    try:
+        while True:
+            try:
+                return call(*args, **kwargs)
+            except sqlite3.OperationalError as exc:
+                if "database is locked" not in str(exc):
+                    raise
+                now = time.perf_counter()
+                if waited_since is None:
+                    waited_since = now
+                    lock_stats["busy"] += 1
+                if now - waited_since >= busy_timeout:
+                    raise
+                time.sleep(BUSY_POLL)
+    finally:
+        if waited_since is not None:
+            lock_stats["wait"] += time.perf_counter() - waited_since
+
+
+class LockProbeCursor(sqlite3.Cursor):
+    """Cursor whose statements go through wait_for_lock."""
+
+    def execute(self, *args, **kwargs):
+        return wait_for_lock(super().execute, *args, **kwargs)
+
+
+class LockProbeConnection(sqlite3.Connection):
+    """Connection whose statements, cursors and commits go through wait_for_lock."""
+
+    def cursor(self, factory=LockProbeCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args, **kwargs):
+        return wait_for_lock(super().execute, *args, **kwargs)
+
+    def commit(self):
+        return wait_for_lock(super().commit)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # The built-in __exit__ commits in C and rolls back if the lock is busy,
+        # so commit through the probe first and leave it nothing to do.
+        if exc_type is None:
+            self.commit()
+        return super().__exit__(exc_type, exc_value, traceback)
+
+
+def patch_connect(**kwargs):
+    """Make chatbot.py's sqlite3.connect calls pass the given arguments."""
+    if isinstance(sqlite3.connect, functools.partial):
+        return
+    sqlite3.connect = functools.partial(sqlite3.connect, **kwargs)
+
+
+def install_lock_probe(timeout):
+    """Make chatbot.py's sqlite3.connect calls open LockProbeConnections."""
+    global busy_timeout
+    busy_timeout = timeout
+    patch_connect(timeout=0, factory=LockProbeConnection)
+
+
+# ---------- DB Seeding ----------
+def seed_db(db_dir, tasks, meals):
+    """Let chatbot.py create its schema in db_dir, then fill it with rows."""
+    os.chdir(db_dir)
+    # AppTest swaps in chatbot.py as __main__ and leaves it there, which would
+    # stop the process pool from pickling run_session by reference.
+    main_module = sys.modules["__main__"]
+    AppTest.from_file(APP_PATH, default_timeout=60).run()
+    sys.modules["__main__"] = main_module
+
+    rng = random.Random(0)
+    today = date.today()
+    with sqlite3.connect(DB_NAME) as conn:
+        conn.executemany(
+            'INSERT INTO tasks (task, status, due_date) VALUES (?, ?, ?)',
+            [
+                (f"Seed task {i}", rng.choice(["Not Done", "Done"]),
+                 (today + timedelta(days=rng.randint(-45, 45))).isoformat())
+                for i in range(tasks)
+            ],
+        )
+        conn.executemany(
+            'INSERT INTO food_planner (food, plan_date, meal_type) VALUES (?, ?, ?)',
+            [
+                (f"Seed meal {i}", (today + timedelta(days=rng.randint(-45, 45))).isoformat(),
+                 rng.choice(["Breakfast", "Lunch", "Dinner"]))
+                for i in range(meals)
+            ],
+        )
+
+
+# ---------- Session Helpers ----------
+def find_widget(widgets, label):
+    return next((w for w in widgets if w.label == label), None)
+
+
+class Session:
+    """One simulated user: an AppTest instance plus the stats it collected.
+
+    Scenarios return False when they are cut short, either because a rerun
+    raised (e.g. "database is locked") or because a widget they need is not
+    on the page after such a failed rerun.
+    """
+
+    def __init__(self, session_id, timeout):
+        self.session_id = session_id
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.latencies = []
+        self.lock_waits = []
+        self.lock_errors = 0
+        self.other_errors = 0
+        self.fallbacks = 0
+        self.aborted = 0
+
+    def run(self, element=None):
+        """Rerun the script (optionally via a widget), record its latency and
+        return whether it finished without an exception."""
+        waited = lock_stats["wait"]
+        start = time.perf_counter()
+        self.at = (element or self.at).run()
+        self.latencies.append(time.perf_counter() - start)
+        self.lock_waits.append(lock_stats["wait"] - waited)
+        for exc in self.at.exception:
+            if "database is locked" in exc.message:
+                self.lock_errors += 1
+            else:
+                self.other_errors += 1
+        return not self.at.exception
+
+    def go_to(self, page):
+        if not self.at.sidebar.radio:
+            # The last rerun died before the sidebar was drawn (init_db runs
+            # first), so rerun from scratch to get the navigation back.
+            if not self.run():
+                return False
+        return self.run(self.at.sidebar.radio[0].set_value(page))
+
+    # ---------- Scenarios ----------
+    def add_task(self, rng):
+        if not self.go_to("To-Do List") or not self.at.text_input:
+            return False
+        self.at.text_input[0].input(f"Load test task s{self.session_id}-{rng.randint(0, 10**6)}")
+        add = find_widget(self.at.button, "Add Task")
+        return add is not None and self.run(add.click())
+
+    def mark_done(self, rng):
+        if not self.go_to("To-Do List"):
+            return False
+        done_buttons = [b for b in self.at.button if b.label == "✅ Done"]
+        if not done_buttons:
+            # Nothing left to complete; add a task instead and say so in the report.
+            self.fallbacks += 1
+            return self.add_task(rng)
+        return self.run(rng.choice(done_buttons).click())
+
+    def spin_and_save(self, rng):
+        if not self.go_to("Food Spinner"):
+            return False
+        meal_box = find_widget(self.at.selectbox, "Meal Type for Spinning")
+        if meal_box is None or not self.run(meal_box.set_value(rng.choice(["Breakfast", "Lunch", "Dinner"]))):
+            return False
+        spin = find_widget(self.at.button, "🎲 Spin Wheel")
+        if spin is None or not self.run(spin.click()):
+            return False
+        save = find_widget(self.at.button, "✅ Save This Meal")
+        return save is None or self.run(save.click())
+
+    def browse_calendar(self, rng):
+        if not self.go_to("Calendar 📅"):
+            return False
+        for month in rng.sample(range(1, 13), 3):
+            month_box = find_widget(self.at.selectbox, "Month")
+            if month_box is None or not self.run(month_box.set_value(month)):
+                return False
+        return True
+
+
+def session_result(session=None, started=None, error=None):
+    """Stats one worker hands back to run_level; session is None if it never started."""
+    return {
+        "started": started,
+        "finished": time.time(),
+        "latencies": session.latencies if session else [],
+        "lock_waits": session.lock_waits if session else [],
+        "busy": lock_stats["busy"] if started is not None else 0,
+        "lock_errors": session.lock_errors if session else 0,
+        "other_errors": session.other_errors if session else 0,
+        "fallbacks": session.fallbacks if session else 0,
+        "aborted": session.aborted if session else 0,
+        "error": None if error is None else f"{type(error).__name__}: {error}",
+    }
+
+
+def run_session(db_dir, session_id, args, barrier):
+    """Worker entry point: play `args.iterations` random scenarios for one user.
+
+    The barrier holds every session until all of them have finished their
+    cold start, so the timed window only covers concurrent reruns. Errors
+    are returned in the result rather than raised, so one broken session
+    does not throw away the rest of the level.
+    """
+    session = None
+    try:
+        os.chdir(db_dir)
+        if args.lock_probe:
+            install_lock_probe(args.busy_timeout)
+        else:
+            patch_connect(timeout=args.busy_timeout)
+        rng = random.Random(args.seed + session_id)
+        session = Session(session_id, args.timeout)
+        session.at.run()  # cold start, not counted
+    except Exception as exc:
+        # Release the other sessions instead of leaving them at the barrier.
+        barrier.abort()
+        return session_result(session, error=exc)
+
+    try:
+        barrier.wait(args.timeout)
+    except Exception as exc:
+        return session_result(session, error=exc)
+    lock_stats.update(busy=0, wait=0.0)
+    started = time.time()
+
+    names = list(SCENARIO_WEIGHTS)
+    weights = list(SCENARIO_WEIGHTS.values())
+    try:
+        for _ in range(args.iterations):
+            scenario = rng.choices(names, weights=weights)[0]
+            if not getattr(session, scenario)(rng):
+                session.aborted += 1
+    except Exception as exc:
+        return session_result(session, started, exc)
+    return session_result(session, started)
+
+
+# ---------- Reporting ----------
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round(pct / 100 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def run_level(args, db_dir, concurrency):
+    with multiprocessing.Manager() as manager, ProcessPoolExecutor(max_workers=concurrency) as pool:
+        barrier = manager.Barrier(concurrency)
+        futures = [pool.submit(run_session, db_dir, i, args, barrier) for i in range(concurrency)]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as exc:  # the worker process itself died
+                results.append(session_result(error=exc))
+
+    # Timed window: from the earliest session start after the barrier to the
+    # latest session finish.
+    starts = [r["started"] for r in results if r["started"] is not None]
+    window = max(r["finished"] for r in results) - min(starts) if starts else 0.0
+    latencies = sorted(latency for r in results for latency in r["latencies"])
+    lock_waits = sorted(wait for r in results for wait in r["lock_waits"])
+    return {
+        "sessions": concurrency,
+        "reruns": len(latencies),
+        "throughput": len(latencies) / window if window else 0.0,
+        "mean": statistics.fmean(latencies) if latencies else 0.0,
+        "p50": percentile(latencies, 50),
+        "p90": percentile(latencies, 90),
+        "p99": percentile(latencies, 99),
+        "max": latencies[-1] if latencies else 0.0,
+        "busy": sum(r["busy"] for r in results),
+        "lock_wait": sum(lock_waits),
+        "lock_wait_p99": percentile(lock_waits, 99),
+        "lock_errors": sum(r["lock_errors"] for r in results),
+        "other_errors": sum(r["other_errors"] for r in results),
+        "fallbacks": sum(r["fallbacks"] for r in results),
+        "aborted": sum(r["aborted"] for r in results),
+        "errors": [r["error"] for r in results if r["error"]],
+    }
+
+
+def print_header():
+    header = (f"{'sessions':>8} {'reruns':>7} {'rerun/s':>8} {'mean ms':>8} {'p50 ms':>8} "
+              f"{'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} {'busy':>6} {'wait ms':>8} "
+              f"{'wait p99':>8} {'locked':>7} {'errors':>7} {'fallback':>8} {'aborted':>7} "
+              f"{'failed':>6}")
+    print(header)
+    print("-" * len(header))
+
+
+def print_row(row, lock_probe):
+    if lock_probe:
+        lock_cols = (f"{row['busy']:>6} {row['lock_wait'] * 1000:>8.1f} "
+                     f"{row['lock_wait_p99'] * 1000:>8.1f}")
+    else:
+        lock_cols = f"{'n/a':>6} {'n/a':>8} {'n/a':>8}"
+    print(f"{row['sessions']:>8} {row['reruns']:>7} {row['throughput']:>8.1f} "
+          f"{row['mean'] * 1000:>8.1f} {row['p50'] * 1000:>8.1f} {row['p90'] * 1000:>8.1f} "
+          f"{row['p99'] * 1000:>8.1f} {row['max'] * 1000:>8.1f} {lock_cols} "
+          f"{row['lock_errors']:>7} {row['other_errors']:>7} {row['fallbacks']:>8} "
+          f"{row['aborted']:>7} {len(row['errors']):>6}")
+    for error in row["errors"]:
+        print(f"{'':>8} failed session: {error}")
+
+
+def print_footer(args):
+    print("\nbusy: statements that found the DB locked; wait ms: total time spent waiting "
+          "for the lock; wait p99: per-rerun lock wait; locked: reruns that gave up after "
+          f"{args.busy_timeout:g} s; fallback: mark-done scenarios that found no pending task "
+          "and added one instead; aborted: scenarios cut short by a failed rerun; failed: "
+          "sessions that stopped with an error.")
+    if args.lock_probe:
+        print("Lock probe on: connections use timeout=0 and a fixed 1 ms poll instead of "
+              "SQLite's backoff busy handler, so latencies reflect that retry policy. "
+              "Use --no-lock-probe to measure with the app's own sqlite3 defaults.")
+    else:
+        print("Lock probe off: connections use sqlite3's own busy handler; busy and wait "
+              "are not measured.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for the Personal Planner app.")
+    parser.add_argument("--sessions", default="1,2,4,8",
+                        help="comma-separated concurrency levels to run (default: 1,2,4,8)")
+    parser.add_argument("--iterations", type=int, default=10,
+                        help="scenarios each simulated user plays per level (default: 10)")
+    parser.add_argument("--seed-tasks", type=int, default=200, help="tasks to seed the DB with")
+    parser.add_argument("--seed-meals", type=int, default=200, help="planned meals to seed the DB with")
+    parser.add_argument("--timeout", type=float, default=60, help="per-rerun timeout in seconds")
+    parser.add_argument("--busy-timeout", type=float, default=DEFAULT_BUSY_TIMEOUT,
+                        help="seconds a connection waits for a locked DB before failing "
+                             f"(default: {DEFAULT_BUSY_TIMEOUT:g}, sqlite3's default)")
+    parser.add_argument("--no-lock-probe", dest="lock_probe", action="store_false",
+                        help="keep sqlite3's own busy handler; busy and wait are not measured")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the user scripts")
+    args = parser.parse_args()
+
+    levels = [int(n) for n in args.sessions.split(",") if n.strip()]
+
+    print(f"Seeding {args.seed_tasks} tasks and {args.seed_meals} meals per level, "
+          f"{args.iterations} scenarios per session\n")
+
+    original_cwd = os.getcwd()
+    print_header()
+    try:
+        for concurrency in levels:
+            with tempfile.TemporaryDirectory() as db_dir:
+                seed_db(db_dir, args.seed_tasks, args.seed_meals)
+                row = run_level(args, db_dir, concurrency)
+                os.chdir(original_cwd)
+            print_row(row, args.lock_probe)
+    finally:
+        os.chdir(original_cwd)
+        print_footer(args)
+
+
+if __name__ == "__main__":
+    main()